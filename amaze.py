@@ -8,20 +8,44 @@ import argparse
 import pathlib
 import sys
 
-import maze.algorithm
 import maze.grid
-import maze.output
+
+GUIS = 'mask maze'.split()
 
 class HelpFormatter(argparse.RawTextHelpFormatter
         , argparse.ArgumentDefaultsHelpFormatter):
     pass
 
+def run_gui(gui):
+    if 'mask' == gui:
+        from maze.widgets import mask_edit_main
+        mask_edit_main()
+    elif 'maze' == gui:
+        from maze.widgets import maze_main
+        maze_main()
+    else:
+        raise SystemExit(f'Invalid GUI: {gui}')
+
 def main(args_list=None):
+    args_list = args_list or sys.argv[1:]
+
+    # The GUIs don't need the algorithms or the output formats (and cairo)
+    # so a lone --gui is handled before loading them.  Anything else (-h
+    # included) is left for the full parser to deal with.
+    gui_parser = argparse.ArgumentParser(add_help=False)
+    gui_parser.add_argument('--gui')
+    gui_args, rest = gui_parser.parse_known_args(args_list)
+    if gui_args.gui in GUIS and not rest:
+        run_gui(gui_args.gui)
+
+    import maze.algorithm
+    import maze.output
+
     arg_parser = argparse.ArgumentParser(description='Make a maze'
         , formatter_class=HelpFormatter)
     _a = arg_parser.add_argument
     _a('-a', '--algorithm', default='binary_tree'
-        , choices=sorted(maze.algorithm.names)
+        , choices=maze.algorithm.sorted_names
         , help='Maze-generation algorithm to use')
     _a('-b', '--braid', type=float, default=0., help='Percent of dead ends to cull')
     _a('-c', '--color', action='store_true', help='Color output')
@@ -33,19 +57,12 @@ def main(args_list=None):
     _a('-s', '--scale', type=float, default=1., help='Amount to scale drawing by')
     _a('-H', '--height', default=5, type=int, help='Maze height')
     _a('-W', '--width', default=5, type=int, help='Maze width')
-    _a('--gui', choices='mask maze'.split()
+    _a('--gui', choices=GUIS
         , help='Short circuit everything and open specified GUI')
-    args = arg_parser.parse_args(args_list or sys.argv[1:])
+    args = arg_parser.parse_args(args_list)
 
     if args.gui is not None:
-        if 'mask' == args.gui:
-            from maze.widgets import mask_edit_main
-            mask_edit_main()
-        elif 'maze' == args.gui:
-            from maze.widgets import maze_main
-            maze_main()
-        else:
-            raise SystemExit(f'Invalid GUI: {args.gui}')
+        run_gui(args.gui)
 
     if args.height < 1:
         raise SystemExit(f'Height should be positive: {args.height}')
@@ -56,7 +73,7 @@ def main(args_list=None):
     else:
         args.braid /= 100.
 
-    gen_algo = getattr(maze.algorithm, args.algorithm)
+    gen_algo = maze.algorithm.by_name[args.algorithm]
 
     if args.mask is not None:
         mask_path = pathlib.Path(args.mask)
@@ -4,6 +4,9 @@
 #
 # SPDX-License-Identifier: MIT
 #
+import random
+
+from concurrent.futures import ProcessPoolExecutor
 from time import monotonic_ns
 
 import maze.grid
@@ -12,24 +15,41 @@ import maze.algorithm
 tries = 100
 size = 20
 
-average = {}
-for name in maze.algorithm.names:
-    algo = getattr(maze.algorithm, name)
-    dead_end_total = 0
-    time_total = 0
-    for _ in range(tries):
-        start = monotonic_ns()
-        grid = algo(maze.grid.Grid(size, size))
-        end = monotonic_ns()
-
-        dead_end_total += len(grid.dead_ends)
-        time_total += end - start
-    average[name] = (dead_end_total / tries, time_total / tries)
-
-cell_count = size * size
-W = max(len(x) for x in average)
-print(f'Average dead-ends per {size}x{size} maze ({cell_count} cells):')
-for name, (de_ave, ns_ave) in sorted(average.items(), key=lambda x: x[1][1]):
-    print(f'{name.rjust(W)}: {100. * de_ave / cell_count:7.3f} %'
-        f' ({ns_ave / 1e6:6.3f} ms)'
-    )
+def run_one(name, seed):
+    # Trials are seeded individually so that they're reproducible no matter
+    # which worker process ends up running them.
+    random.seed(seed)
+    algo = maze.algorithm.by_name[name]
+    start = monotonic_ns()
+    grid = algo(maze.grid.Grid(size, size))
+    end = monotonic_ns()
+
+    return name, len(grid.dead_ends), end - start
+
+def main():
+    names = [ name for name in maze.algorithm.names for _ in range(tries) ]
+    seeds = [ seed for _ in maze.algorithm.names for seed in range(tries) ]
+
+    totals = { name: [0, 0] for name in maze.algorithm.names }
+    with ProcessPoolExecutor() as pool:
+        for name, dead_ends, ns in pool.map(
+            run_one, names, seeds, chunksize=tries
+        ):
+            totals[name][0] += dead_ends
+            totals[name][1] += ns
+
+    average = {
+        name: (dead_end_total / tries, time_total / tries)
+            for name, (dead_end_total, time_total) in totals.items()
+    }
+
+    cell_count = size * size
+    W = max(len(x) for x in average)
+    print(f'Average dead-ends per {size}x{size} maze ({cell_count} cells):')
+    for name, (de_ave, ns_ave) in sorted(average.items(), key=lambda x: x[1][1]):
+        print(f'{name.rjust(W)}: {100. * de_ave / cell_count:7.3f} %'
+            f' ({ns_ave / 1e6:6.3f} ms)'
+        )
+
+if '__main__' == __name__:
+    main()
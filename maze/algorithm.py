@@ -3,18 +3,31 @@
 #
 # SPDX-License-Identifier: MIT
 #
-from random import choice, randint
+from random import choice, getrandbits, shuffle
 
 names = set()
+by_name = {}
 def register_algo(fn):
     names.add(fn.__name__)
+    by_name[fn.__name__] = fn
     return fn
 
 @register_algo
 def binary_tree(grid):
-    for cell in grid.each_cell:
-        if neighbors := list(filter(None, (cell.N, cell.E))):
-            cell.link(choice(neighbors))
+    for row in grid.each_row:
+        # Draw the coin flips for the whole row at once; a set bit means N.
+        coins = getrandbits(len(row))
+        for cell in row:
+            coin = coins & 1
+            coins >>= 1
+            if cell is None:
+                continue
+
+            N, E = cell.N, cell.E
+            if N and E:
+                cell.link(N if coin else E)
+            elif N or E:
+                cell.link(N or E)
 
     return grid
 
@@ -27,63 +40,127 @@ def sidewinder(grid):
         run.clear()
         for cell in row:
             run_append(cell)
-            at_E = cell.E is None
-            not_at_N = cell.N is not None
-            if at_E or (not_at_N and randint(0, 1)):
+            E = cell.E
+            if E is None or (cell.N is not None and getrandbits(1)):
                 member = choice(run)
                 run.clear()
                 if member.N:
                     member.link(member.N)
             else:
-                cell.link(cell.E)
+                cell.link(E)
 
     return grid
 
+def _cell_table(grid):
+    # Number the cells so that the random walks below can run over plain
+    # ints: neighbors[i] holds the indices of the neighbors of cells[i].
+    cells = list(grid.each_cell)
+    index = { cell: i for i, cell in enumerate(cells) }
+    neighbors = [ tuple(index[n] for n in cell.neighbors) for cell in cells ]
+
+    return cells, index, neighbors
+
 @register_algo
 def aldous_broder(grid):
-    cell = grid.random_cell
-    unvisited = grid.size - 1
+    cells, index, neighbors = _cell_table(grid)
+    current = index[grid.random_cell]
+    visited = bytearray(len(cells))
+    visited[current] = 1
+    unvisited = len(cells) - 1
 
     while unvisited:
-        neighbor = cell.random_neighbor
+        neighbor = choice(neighbors[current])
 
-        if not neighbor.links:
-            cell.link(neighbor)
+        if not visited[neighbor]:
+            visited[neighbor] = 1
+            cells[current].link(cells[neighbor])
             unvisited -= 1
 
-        cell = neighbor
+        current = neighbor
 
     return grid
 
-def remove_random(L):
-    i = randint(0, len(L) - 1)
-    ele = L[i]
-    del L[i]
-
 @register_algo
 def wilsons(grid):
-    unvisited = list(grid.each_cell)
-    remove_random(unvisited)
-
+    cells, _, neighbors = _cell_table(grid)
+    in_maze = bytearray(len(cells))
+    # Where each cell sits in the current path (-1 if it isn't in it).
+    path_pos = [-1] * len(cells)
+
+    # Cells not yet in the maze along with each one's slot in that list so
+    # that they can be swapped out in O(1).
+    unvisited = list(range(len(cells)))
+    slot = list(range(len(cells)))
+    def visit(cell):
+        in_maze[cell] = 1
+        last = unvisited.pop()
+        if last != cell:
+            unvisited[slot[cell]] = last
+            slot[last] = slot[cell]
+
+    visit(choice(unvisited))
     while unvisited:
         cell = choice(unvisited)
         path = [cell]
-
-        while cell in unvisited:
-            cell = cell.random_neighbor
-            if cell in path:
-                path = path[:path.index(cell) + 1]
+        path_pos[cell] = 0
+
+        while not in_maze[cell]:
+            cell = choice(neighbors[cell])
+            pos = path_pos[cell]
+            if pos >= 0:
+                for erased in path[pos + 1:]:
+                    path_pos[erased] = -1
+                del path[pos + 1:]
             else:
+                path_pos[cell] = len(path)
                 path.append(cell)
 
         for i in range(len(path) - 1):
-            path[i].link(path[i + 1])
-            unvisited.remove(path[i])
+            cells[path[i]].link(cells[path[i + 1]])
+            visit(path[i])
+
+        for cell in path:
+            path_pos[cell] = -1
+
+    return grid
+
+@register_algo
+def kruskal(grid):
+    cells, index, _ = _cell_table(grid)
+    edges = [
+        (i, index[neighbor]) for i, cell in enumerate(cells)
+            for neighbor in (cell.E, cell.S) if neighbor is not None
+    ]
+    shuffle(edges)
+
+    # Union-find over the cell indices (with path halving).
+    parent = list(range(len(cells)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    remaining = len(cells) - 1
+    for u, v in edges:
+        if not remaining:
+            break
+
+        root_u, root_v = find(u), find(v)
+        if root_u != root_v:
+            parent[root_u] = root_v
+            cells[u].link(cells[v])
+            remaining -= 1
 
     return grid
 
 @register_algo
 def hunt_and_kill(grid):
+    cells = list(grid.each_cell)
+    # Links are never removed, so every hunt can pick up after the leading
+    # run of already linked cells instead of rescanning them.
+    hunt_start = 0
+
     current = grid.random_cell
     while current:
         if unvisited_neighbors := current.neighbors_without_links:
@@ -93,9 +170,14 @@ def hunt_and_kill(grid):
         else:
             current = None
 
-            for cell in grid.each_cell:
-                visited_neighbors = cell.neighbors_with_links
-                if not cell.has_links and visited_neighbors:
+            while hunt_start < len(cells) and cells[hunt_start].has_links:
+                hunt_start += 1
+
+            for i in range(hunt_start, len(cells)):
+                cell = cells[i]
+                if cell.has_links:
+                    continue
+                if visited_neighbors := cell.neighbors_with_links:
                     current = cell
                     neighbor = choice(visited_neighbors)
                     current.link(neighbor)
@@ -105,12 +187,11 @@ def hunt_and_kill(grid):
 
 @register_algo
 def recursive_backtracker(grid, start=None):
-    stack = []
-    push, pop, top = stack.append, stack.pop, lambda: stack[-1]
-    push(start or grid.random_cell)
+    stack = [ start or grid.random_cell ]
+    push, pop = stack.append, stack.pop
 
     while stack:
-        current = top()
+        current = stack[-1]
         if unvisited_neighbors := current.neighbors_without_links:
             neighbor = choice(unvisited_neighbors)
             current.link(neighbor)
@@ -120,4 +201,6 @@ def recursive_backtracker(grid, start=None):
 
     return grid
 
+sorted_names = tuple(sorted(names))
+
 del register_algo
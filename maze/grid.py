@@ -3,11 +3,15 @@
 #
 # SPDX-License-Identifier: MIT
 #
+import io
 import string
 
+from operator import itemgetter
 from random import choice, random, shuffle
 
 class Distances(dict):
+    __slots__ = ('root',)
+
     def __init__(self, root):
         self.root = root
         self[root] = 0
@@ -32,22 +36,32 @@ class Distances(dict):
 
     @property
     def max(self):
-        max_distance = 0
-        max_cell = self.root
-
-        for cell in self:
-            if self[cell] > max_distance:
-                max_cell = cell
-                max_distance = self[cell]
-
-        return max_cell, max_distance
+        return max(self.items(), key=itemgetter(1))
+
+# Links are kept as a bitmask with one bit per direction.  Bit i corresponds
+# to Cell._neighbors[i], i.e., N, E, S and W in that order.  The neighbors
+# are also plain N, E, S and W attributes that only Grid sets.
+_LINK_BITS = (1, 2, 4, 8)
+# Number of links for each possible mask.
+_LINK_COUNT = tuple(bin(mask).count('1') for mask in range(16))
+# Indices into Cell._neighbors of the links for each possible mask.
+_LINK_INDICES = tuple(
+    tuple(i for i in range(4) if mask >> i & 1) for mask in range(16)
+)
 
 class Cell:
+    __slots__ = (
+        '_row', '_column', '_links', 'N', 'E', 'S', 'W', '_neighbors',
+        '_neighbors_tuple'
+    )
+
     def __init__(self, row, column):
         self._row = row
         self._column = column
-        self._links = set()
-        self._neighbors = [None] * 4
+        self._links = 0
+        self.N = self.E = self.S = self.W = None
+        self._neighbors = (None,) * 4
+        self._neighbors_tuple = ()
 
     @property
     def row(self):
@@ -57,95 +71,81 @@ class Cell:
     def column(self):
         return self._column
 
-    @property
-    def N(self):
-        return self._neighbors[0]
-
-    @N.setter
-    def N(self, cell):
-        if self._neighbors[0] is None:
-            self._neighbors[0] = cell
-
-    @property
-    def E(self):
-        return self._neighbors[1]
-
-    @E.setter
-    def E(self, cell):
-        if self._neighbors[1] is None:
-            self._neighbors[1] = cell
-
-    @property
-    def S(self):
-        return self._neighbors[2]
-
-    @S.setter
-    def S(self, cell):
-        if self._neighbors[2] is None:
-            self._neighbors[2] = cell
-
-    @property
-    def W(self):
-        return self._neighbors[3]
-
-    @W.setter
-    def W(self, cell):
-        if self._neighbors[3] is None:
-            self._neighbors[3] = cell
-
     @property
     def neighbors(self):
-        return list(filter(None, self._neighbors))
+        return self._neighbors_tuple
 
     @property
     def neighbors_with_links(self):
-        return list(filter(lambda x: x.has_links, self.neighbors))
+        return [ x for x in self._neighbors_tuple if x._links ]
 
     @property
     def neighbors_without_links(self):
-        return list(filter(lambda x: not x.has_links, self.neighbors))
+        return [ x for x in self._neighbors_tuple if not x._links ]
 
     @property
     def random_neighbor(self):
-        return choice(self.neighbors)
+        return choice(self._neighbors_tuple)
+
+    def _link_bit(self, cell):
+        if cell is None:
+            return 0
+        if cell is self.N:
+            return 1
+        if cell is self.E:
+            return 2
+        if cell is self.S:
+            return 4
+        if cell is self.W:
+            return 8
+        return 0
 
     def link(self, cell, bidirectional=True):
-        self._links.add(cell)
+        bit = self._link_bit(cell)
+        if not bit:
+            raise ValueError('Can only link to a neighboring cell')
+        self._links |= bit
         if bidirectional:
             cell.link(self, False)
         return self
 
     def unlink(self, cell, bidirectional=True):
-        self._links.remove(cell)
+        self._links &= ~self._link_bit(cell)
         if bidirectional:
             cell.unlink(self, False)
         return self
 
     def linked_to(self, cell):
-        return cell in self._links
+        return bool(self._links & self._link_bit(cell))
 
     @property
     def links(self):
-        return self._links
+        neighbors = self._neighbors
+        return [ neighbors[i] for i in _LINK_INDICES[self._links] ]
+
+    @property
+    def link_count(self):
+        return _LINK_COUNT[self._links]
 
     @property
     def has_links(self):
-        return bool(len(self._links))
+        return 0 != self._links
 
     @property
     def distances(self):
         distances = Distances(self)
-        frontier = [self]
-
-        while frontier:
-            next_frontier = []
-            for cell in frontier:
-                for linked in cell.links:
-                    if linked in distances:
-                        continue
-                    distances[linked] = distances[cell] + 1
-                    next_frontier.append(linked)
-            frontier = next_frontier
+        # Breadth-first; the for loop picks up cells as they're queued.
+        queue = [self]
+        enqueue = queue.append
+
+        for cell in queue:
+            distance = distances[cell] + 1
+            neighbors = cell._neighbors
+            for i in _LINK_INDICES[cell._links]:
+                linked = neighbors[i]
+                if linked not in distances:
+                    distances[linked] = distance
+                    enqueue(linked)
 
         return distances
 
@@ -164,30 +164,22 @@ class Grid:
         return self._grid[r][c]
 
     def __str__(self):
-        lines = [ '+' + '---+' * self.columns ]
-        lines_append = lines.append
-        dummy_cell = Cell(-1, -1)
-
-        mid, bot = [], []
-        mid_append, bot_append = mid.append, bot.append
-        for row in self._grid:
-            mid_append('|')
-            bot_append('+')
-
-            for cell in row:
-                cell = cell or dummy_cell
-                mid_append(f' {self.cell_interior(cell)} ')
-                mid_append(' ' if cell.linked_to(cell.E) else '|')
-                bot_append(' ' * 3 if cell.linked_to(cell.S) else '-' * 3)
-                bot_append('+')
+        out = io.StringIO()
+        write = out.write
+        interior = self.cell_interior
 
-            lines_append(''.join(mid))
-            lines_append(''.join(bot))
+        write('+' + '---+' * self.columns)
+        for row, E_row, S_row in zip(self.each_dense_row, *self.link_matrices):
+            write('\n|')
+            for cell, linked_E in zip(row, E_row):
+                write(f' {interior(cell)} ')
+                write(' ' if linked_E else '|')
 
-            mid.clear()
-            bot.clear()
+            write('\n+')
+            for linked_S in S_row:
+                write('   +' if linked_S else '---+')
 
-        return '\n'.join(lines)
+        return out.getvalue()
 
     def _prepare_grid(self, rows, columns):
         self._grid = [
@@ -195,12 +187,20 @@ class Grid:
         ]
 
     def _configure_cells(self):
-        for cell in self.each_cell:
-            r, c = cell.row, cell.column
-            cell.N = self[r - 1, c]
-            cell.E = self[r, c + 1]
-            cell.S = self[r + 1, c]
-            cell.W = self[r, c - 1]
+        grid = self._grid
+        last_r, last_c = len(grid) - 1, len(grid[0]) - 1
+        for r, row in enumerate(grid):
+            above = grid[r - 1] if r > 0 else None
+            below = grid[r + 1] if r < last_r else None
+            for c, cell in enumerate(row):
+                if cell is None:
+                    continue
+                cell.N = N = above[c] if above is not None else None
+                cell.E = E = row[c + 1] if c < last_c else None
+                cell.S = S = below[c] if below is not None else None
+                cell.W = W = row[c - 1] if c > 0 else None
+                cell._neighbors = neighbors = (N, E, S, W)
+                cell._neighbors_tuple = tuple(filter(None, neighbors))
 
     @property
     def rows(self):
@@ -220,8 +220,14 @@ class Grid:
 
     @property
     def each_row(self):
+        return iter(self._grid)
+
+    @property
+    def each_dense_row(self):
+        # Like each_row but with an unlinked stand-in for masked-out cells.
+        absent = Cell(-1, -1)
         for row in self._grid:
-            yield row
+            yield [ cell or absent for cell in row ] if None in row else row
 
     @property
     def each_cell(self):
@@ -230,6 +236,19 @@ class Grid:
                 if col is not None:
                     yield col
 
+    @property
+    def link_matrices(self):
+        # Row-major booleans of which cells link to their E and S neighbors,
+        # built in one pass over the link masks.
+        E, S = _LINK_BITS[1], _LINK_BITS[2]
+        link_E, link_S = [], []
+        for row in self._grid:
+            masks = [ 0 if cell is None else cell._links for cell in row ]
+            link_E.append([ bool(links & E) for links in masks ])
+            link_S.append([ bool(links & S) for links in masks ])
+
+        return link_E, link_S
+
     def cell_interior(self, cell):
         return ' '
 
@@ -240,7 +259,7 @@ class Grid:
     def dead_ends(self):
         dead_ends = []
         for cell in self.each_cell:
-            if 1 == len(cell.links):
+            if 1 == _LINK_COUNT[cell._links]:
                 dead_ends.append(cell)
 
         return dead_ends
@@ -250,40 +269,56 @@ class Grid:
         shuffle(dead_ends)
 
         for cell in dead_ends:
-            if 1 != len(cell.links) or random() > p:
+            if 1 != cell.link_count or random() > p:
                 continue
 
             unlinked_neighbors = [
                 x for x in cell.neighbors if not cell.linked_to(x)
             ]
             dead_end_neighbors = list(
-                filter(lambda x: 1 == len(x.links), unlinked_neighbors)
+                filter(lambda x: 1 == x.link_count, unlinked_neighbors)
             )
 
             cell.link(choice(dead_end_neighbors or unlinked_neighbors))
 
 _b62 = string.digits + string.ascii_lowercase + string.ascii_uppercase
+def _b62enc(distance, _digits=_b62.encode('ascii')):
+    # Digits are written from the right; 11 of them cover anything < 2**64.
+    buf = bytearray(11)
+    i = len(buf)
+    while True:
+        distance, digit = divmod(distance, len(_digits))
+        i -= 1
+        buf[i] = _digits[digit]
+        if not distance:
+            break
+
+    return buf[i:].decode('ascii')
+
 class DistanceGrid(Grid):
     def __init__(self, *a, **kw):
         super().__init__(*a, **kw)
 
         self.distances = None
 
-    def cell_interior(self, cell):
-        if self.distances is None or self.distances.get(cell) is None:
-            return super().cell_interior(cell)
+    @property
+    def distances(self):
+        return self._distances
 
-        distance = self.distances[cell]
-        if 0 == distance:
-            return '0'
+    @distances.setter
+    def distances(self, distances):
+        self._distances = distances
+        self._labels = None
+        if distances is not None:
+            # Every label that can show up, so rendering is just a lookup.
+            _, maximum = distances.max
+            self._labels = [ _b62enc(d) for d in range(maximum + 1) ]
 
-        rep = []
-        base = len(_b62)
-        while distance:
-            distance, i = divmod(distance, base)
-            rep.append(_b62[i])
+    def cell_interior(self, cell):
+        if self._distances is None or self._distances.get(cell) is None:
+            return super().cell_interior(cell)
 
-        return ''.join(reversed(rep))
+        return self._labels[self._distances[cell]]
 
 class ColoredGrid(Grid):
     def __init__(self, *a, **kw):
@@ -313,9 +348,18 @@ class ColoredGrid(Grid):
 
         return (R, G, B)
 
+# For flipping/printing the one-byte-per-cell mask storage.
+_INVERT_CELLS = bytes.maketrans(b'\0\1', b'\1\0')
+_SHOW_CELLS = bytes.maketrans(b'\0\1', b'o.')
+_FLIPPED_CELL = (b'\1', b'\0')
+
 class Mask:
     def __init__(self, rows, columns):
-        self._mask = [ [ True for c in range(columns) ] for r in range(rows) ]
+        self._rows = rows
+        self._columns = columns
+        # One byte per cell in row-major order; 1 is on.
+        self._mask = bytearray(b'\1') * (rows * columns)
+        self._on = None
 
     def __getitem__(self, index):
         r, c = index
@@ -323,7 +367,7 @@ class Mask:
             return False
         if c < 0 or c >= self.columns:
             return False
-        return self._mask[r][c]
+        return 1 == self._mask[r * self._columns + c]
 
     def __setitem__(self, index, is_on):
         r, c = index
@@ -331,138 +375,143 @@ class Mask:
             raise IndexError(f'Row index is out of range: {r}')
         if c < 0 or c >= self.columns:
             raise IndexError(f'Column index is out of range: {c}')
-        self._mask[r][c] = is_on
+        self._mask[r * self._columns + c] = 1 if is_on else 0
+        self._on = None
+
+    def resize_preserve(self, rows, columns):
+        # The overlapping cells are kept and any new ones are on.
+        W = self._columns
+        keep = min(rows, self._rows)
+        if columns == W:
+            cells = self._mask
+            del cells[keep * W:]
+        else:
+            c = min(columns, W)
+            pad = b'\1' * (columns - c)
+            cells = bytearray().join(
+                self._mask[i:i + c] + pad for i in range(0, keep * W, W)
+            )
+        cells += b'\1' * ((rows - keep) * columns)
+
+        self._mask = cells
+        self._rows, self._columns = rows, columns
+        self._on = None
+
+    def invert(self):
+        self._mask = self._mask.translate(_INVERT_CELLS)
+        self._on = None
 
     def __str__(self):
-        lines = []
-        for row in self._mask:
-            ch = []
-            for x in row:
-                ch.append('.' if x else 'o')
-            lines.append(''.join(ch))
-        return '\n'.join(lines)
+        shown = self._mask.translate(_SHOW_CELLS).decode('ascii')
+        W = self._columns
+        return '\n'.join(shown[i:i + W] for i in range(0, len(shown), W))
 
     @classmethod
     def from_RLE(cls, rle):
         digits, whitespace = string.digits, string.whitespace
         _0 = ord('0')
 
-        class _state:
-            def __init__(self):
-                self.mask = None
-                self.width = None
-                self.height = None
-                self.count = 0
-                self.index = 0
-
-            @property
-            def rowcol(self):
-                return divmod(self.index, self.width)
-
-        s = _state()
-        def get_and_reset_count():
-            cnt = s.count if s.count > 0 else 1
-            s.count = 0
-            return cnt
-
+        mask = width = height = None
+        count = index = 0
         for ch in rle:
             if ch in whitespace:
                 continue
             elif ch in digits:
-                s.count *= 10
-                s.count += ord(ch) - _0
-            elif 'w' == ch:
-                if s.width is None:
-                    s.width = get_and_reset_count()
-                    if s.height is not None and s.mask is None:
-                        s.mask = cls(s.height, s.width)
-                else:
+                count = 10 * count + ord(ch) - _0
+                continue
+
+            if ch in 'who.':
+                run = count if count > 0 else 1
+                count = 0
+
+            if 'w' == ch:
+                if width is not None:
                     raise ValueError(f'Width already specified as {width}')
+                width = run
+                if height is not None:
+                    mask = cls(height, width)
             elif 'h' == ch:
-                if s.height is None:
-                    s.height = get_and_reset_count()
-                    if s.width is not None and s.mask is None:
-                        s.mask = cls(s.height, s.width)
-                else:
+                if height is not None:
                     raise ValueError(f'Height already specified as {height}')
+                height = run
+                if width is not None:
+                    mask = cls(height, width)
             elif 'o' == ch:
-                if s.mask is None:
+                if mask is None:
                     raise ValueError('Must specify dimensions before occupancy')
-                for _ in range(get_and_reset_count()):
-                    r, c = s.rowcol
-                    s.mask[r, c] = False
-                    s.index += 1
+                end = index + run
+                if end > height * width:
+                    raise IndexError(f'Row index is out of range: {height}')
+                mask._mask[index:end] = bytes(run)
+                index = end
             elif '.' == ch:
-                s.index += get_and_reset_count()
+                index += run
             elif '$' == ch:
-                if s.width is None:
+                if width is None:
                     raise ValueError('Must specify width before ending row')
-                r, c = s.rowcol
-                s.index += s.width - c
+                index += width - index % width
             elif '!' == ch:
                 break
             else:
                 raise ValueError(f'Bad character: {repr(ch)}')
 
-        return s.mask
+        return mask
 
     def to_RLE(self):
         rle = [f'{self.rows}h{self.columns}w']
 
-        ch = { True: '.', False: 'o' }
-        current = None
-        count = 0
-        def output_count():
-            if 1 == count:
-                rle.append(ch[current])
-            else:
-                rle.append(f'{count}{ch[current]}')
-
-        for row in self._mask:
-            for val in row:
-                if val != current:
-                    if current is not None:
-                        output_count()
-                    current = val
-                    count = 1
-                else:
-                    count += 1
-
-        if current is not None:
-            output_count()
+        ch = { 1: '.', 0: 'o' }
+        for value, start, stop in self._runs(0, len(self._mask)):
+            count = stop - start
+            rle.append(ch[value] if 1 == count else f'{count}{ch[value]}')
 
         return ''.join(rle)
 
+    def _runs(self, start, stop):
+        # (value, start, stop) for each run of equal bytes in [start, stop).
+        mask = self._mask
+        while start < stop:
+            value = mask[start]
+            end = mask.find(_FLIPPED_CELL[value], start, stop)
+            if -1 == end:
+                end = stop
+            yield value, start, end
+            start = end
+
+    def row_runs(self, r):
+        W = self._columns
+        offset = r * W
+        for value, start, stop in self._runs(offset, offset + W):
+            yield value, start - offset, stop - offset
+
     @property
     def rows(self):
-        return len(self._mask)
+        return self._rows
 
     @property
     def columns(self):
-        return len(self._mask[0])
+        return self._columns
+
+    @property
+    def _locations_on(self):
+        # Built on demand and dropped whenever the mask changes.
+        if self._on is None:
+            W = self._columns
+            self._on = [
+                divmod(i, W) for i, x in enumerate(self._mask) if x
+            ]
+        return self._on
 
     @property
     def count(self):
-        count = 0
-        for row in self._mask:
-            for x in row:
-                if x:
-                    count += 1
-        return count
+        return self._mask.count(1)
 
     @property
     def random_location(self):
-        if 0 == self.count:
+        if not (locations := self._locations_on):
             raise ValueError('No locations on')
 
-        rows = list(range(self.rows))
-        cols = list(range(self.columns))
-        mask = self._mask
-        while True:
-            row = choice(rows)
-            col = choice(cols)
-            if mask[row][col]:
-                return row, col
+        return choice(locations)
 
 class MaskedGrid(Grid):
     def __init__(self, mask):
@@ -5,8 +5,6 @@
 #
 import cairo
 
-from .grid import Cell
-
 class DrawingDimensions:
     def __init__(self, grid, interior_size=2, wall_thickness=1, scale=1):
         s = lambda x: round(scale * x)
@@ -20,30 +18,45 @@ class DrawingDimensions:
         self.E_neighbor_rect = (interior_size + wall_thickness, interior_size)
         self.S_neighbor_rect = (interior_size, interior_size + wall_thickness)
         self.interior_rect = (interior_size, interior_size)
+        # Unpacked copies of the rects for the per-cell drawing loops.
+        self.iw, self.ih = self.interior_rect
+        self.ew, self.eh = self.E_neighbor_rect
+        self.sw, self.sh = self.S_neighbor_rect
 
-def _draw_to_surface(grid, surface, dimension):
-    dummy_cell = Cell(-1, -1)
+def _rects_by_color(grid, dimension):
+    skip, wall = dimension.cell_skip, dimension.wall_thickness
+    iw, ih = dimension.iw, dimension.ih
+    ew, eh = dimension.ew, dimension.eh
+    sw, sh = dimension.sw, dimension.sh
+
+    # Gather the rectangles by color so that each color is filled once.
+    rects_by_color = {}
+    link_E, link_S = grid.link_matrices
+    for r, row in enumerate(grid.each_dense_row):
+        E_row, S_row = link_E[r], link_S[r]
+        y = r * skip + wall
+        for c, cell in enumerate(row):
+            x = c * skip + wall
+            rgb = grid.cell_background_color(cell) or (1, 1, 1)
+            rects = rects_by_color.setdefault(rgb, [])
+            rects.append((x, y, iw, ih))
+            if E_row[c]:
+                rects.append((x, y, ew, eh))
+            if S_row[c]:
+                rects.append((x, y, sw, sh))
 
+    return rects_by_color
+
+def _draw_to_surface(grid, surface, dimension):
     ctx = cairo.Context(surface)
     ctx.set_source_rgb(0, 0, 0)
     ctx.paint()
 
-    for r, row in enumerate(grid.each_row):
-        r *= dimension.cell_skip
-        r += dimension.wall_thickness
-        for c, cell in enumerate(row):
-            c *= dimension.cell_skip
-            c += dimension.wall_thickness
-            cell = cell or dummy_cell
-            ctx.set_source_rgb(*(grid.cell_background_color(cell) or (1, 1, 1)))
-            ctx.rectangle(c, r, *dimension.interior_rect)
-            ctx.fill()
-            if cell.linked_to(cell.E):
-                ctx.rectangle(c, r, *dimension.E_neighbor_rect)
-                ctx.fill()
-            if cell.linked_to(cell.S):
-                ctx.rectangle(c, r, *dimension.S_neighbor_rect)
-                ctx.fill()
+    for rgb, rects in _rects_by_color(grid, dimension).items():
+        ctx.set_source_rgb(*rgb)
+        for rect in rects:
+            ctx.rectangle(*rect)
+        ctx.fill()
 
 formats = set()
 def to_PNG(grid, out, scale=1):
@@ -92,10 +105,21 @@ class UTF8Output:
 
 def to_HTML(grid, out, scale=1):
     d = DrawingDimensions(grid, scale=scale)
-    dummy_cell = Cell(-1, -1)
-    ir = ', '.join(str(x) for x in d.interior_rect)
-    E_nr = ', '.join(str(x) for x in d.E_neighbor_rect)
-    S_nr = ', '.join(str(x) for x in d.S_neighbor_rect)
+    rects_by_color = _rects_by_color(grid, d)
+    palette = ', '.join(
+        "'rgb({}, {}, {})'".format(*(round(255 * x) for x in rgb))
+            for rgb in rects_by_color
+    )
+    # Each rectangle is packed as x, y, width, height, palette index.
+    rects = ', '.join(
+        f'{x}, {y}, {w}, {h}, {i}'
+            for i, rects in enumerate(rects_by_color.values())
+                for x, y, w, h in rects
+    )
+    # Palette indices go in the array too, and colored grids have a color per
+    # distance.
+    fits_16_bits = max(d.W, d.H, len(rects_by_color)) < 1 << 16
+    array_type = 'Uint16Array' if fits_16_bits else 'Uint32Array'
     with UTF8Output(out) as o:
         p = lambda s: print(s, file=o)
         p('''<!DOCTYPE html>
@@ -113,21 +137,15 @@ var canv = document.querySelector('#maze'), ctx = canv.getContext('2d');
 ctx.fillStyle = 'rgb(0, 0, 0)';
 ctx.fillRect(0, 0, canv.width, canv.height);
 ''')
-        for r, row in enumerate(grid.each_row):
-            r *= d.cell_skip
-            r += d.wall_thickness
-            for c, cell in enumerate(row):
-                c *= d.cell_skip
-                c += d.wall_thickness
-                cell = cell or dummy_cell
-                rgb = ', '.join(map(lambda x: str(round(255 * x))
-                    , grid.cell_background_color(cell) or (1, 1, 1)))
-                p(f"ctx.fillStyle = 'rgb({rgb}';\nctx.fillRect({c}, {r}, {ir});")
-                if cell.linked_to(cell.E):
-                    p(f'ctx.fillRect({c}, {r}, {E_nr});')
-                if cell.linked_to(cell.S):
-                    p(f'ctx.fillRect({c}, {r}, {S_nr});')
-        p('''
+        p(f'const P = [{palette}];')
+        p(f'const R = new {array_type}([{rects}]);')
+        p('''for (let i = 0, color = -1; i < R.length; i += 5) {
+    if (R[i + 4] !== color) {
+        color = R[i + 4];
+        ctx.fillStyle = P[color];
+    }
+    ctx.fillRect(R[i], R[i + 1], R[i + 2], R[i + 3]);
+}
 });
 </script></body></html>''')
 formats.add('HTML')
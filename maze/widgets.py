@@ -10,11 +10,12 @@ from PySide6.QtWidgets import (
     QMainWindow, QMessageBox, QSpinBox, QVBoxLayout, QWidget,
     QComboBox, QLabel
 )
-from PySide6.QtCore import Slot, Qt
-from PySide6.QtGui import QColor, QPainter, QShortcut, QKeySequence
+from PySide6.QtCore import QRectF, Slot, Qt
+from PySide6.QtGui import (
+    QBrush, QColor, QPainter, QPixmap, QShortcut, QKeySequence
+)
 
-from .grid import ColoredGrid, Cell, Mask
-from . import algorithm
+from .grid import ColoredGrid, Mask
 
 class RowColumnAlgorithmDialog(QDialog):
     def __init__(self, parent=None, show_algo=True):
@@ -39,8 +40,11 @@ class RowColumnAlgorithmDialog(QDialog):
 
         self._algo = None
         if show_algo:
+            # Only pulled in when needed; the mask editor never is.
+            from . import algorithm
+
             self._algo = combo = QComboBox(self)
-            combo.addItems(sorted(algorithm.names))
+            combo.addItems(algorithm.sorted_names)
             vbox.addWidget(combo)
 
         buttons = QDialogButtonBox(
@@ -75,6 +79,12 @@ class DrawingDimensions:
         self.interior_rect = (interior, interior)
         self.east_neighbor_rect = (interior + wall, interior)
         self.south_neighbor_rect = (interior, interior + wall)
+        self.interior = interior
+        # The coordinates of every row and column for the paint loops.
+        self.row_coords = [ self.row_coord(r) for r in range(grid.rows) ]
+        self.column_coords = [
+            self.column_coord(c) for c in range(grid.columns)
+        ]
 
     def row_coord(self, row):
         return self.cell_skip * row + self.wall
@@ -82,17 +92,30 @@ class DrawingDimensions:
     def column_coord(self, col):
         return self.cell_skip * col + self.wall
 
+def fill_rects(painter, groups):
+    # One drawRects() per brush instead of a fillRect() per rectangle.
+    painter.setPen(Qt.NoPen)
+    for brush, rects in groups:
+        if rects:
+            painter.setBrush(brush)
+            painter.drawRects(rects)
+
 class MaskWidget(QWidget):
     def __init__(self, mask, parent=None):
         super().__init__(parent)
 
         self._mask = mask
-        self._dim = DrawingDimensions(mask)
+        self._dim = None if mask is None else DrawingDimensions(mask)
         self._lastpos = None
         self._wall_color = Qt.black
         self._unused_color = Qt.darkGreen
         self._used_color = QColor(30, 30, 30)
+        # Built once so painting doesn't make a brush per fill.
+        self._wall_brush = QBrush(self._wall_color)
+        self._unused_brush = QBrush(self._unused_color)
+        self._used_brush = QBrush(self._used_color)
         self._has_changed = False
+        self._scaled = None
 
     @property
     def mask(self):
@@ -109,34 +132,112 @@ class MaskWidget(QWidget):
     def note_save(self):
         self._has_changed = False
 
+    def refresh_after_resize(self):
+        self._dim = DrawingDimensions(self._mask)
+        self._lastpos = None
+        self._invalidate()
+
     @Slot()
     def invert(self):
-        mask = self._mask
-        for r in range(mask.rows):
-            for c in range(mask.columns):
-                mask[r, c] = not mask[r, c]
+        self._mask.invert()
         self._has_changed = True
+        self._invalidate()
+
+    def _invalidate(self):
+        self._scaled = None
         self.update()
 
+    def resizeEvent(self, event):
+        self._scaled = None
+        super().resizeEvent(event)
+
     def paintEvent(self, event):
+        # The drawing only changes with the mask, the size or the screen's
+        # pixel ratio so it's rendered once at the widget's device resolution
+        # (in logical units) and each paint is an untransformed blit.
+        ratio = self.devicePixelRatioF()
+        if self._scaled is None or self._scaled.devicePixelRatio() != ratio:
+            self._scaled = QPixmap(self.size() * ratio)
+            self._scaled.setDevicePixelRatio(ratio)
+            p = self._scaled_painter()
+            self._draw(p)
+            p.end()
+
+        # Only copy back what Qt asked to have repainted.  The source is in
+        # the cache's device pixels.
+        dirty = QRectF(event.rect())
+        source = QRectF(
+            dirty.x() * ratio, dirty.y() * ratio,
+            dirty.width() * ratio, dirty.height() * ratio
+        )
+        QPainter(self).drawPixmap(dirty, self._scaled, source)
+
+    def _draw(self, p):
         mask = self._mask
         dim = self._dim
-        wall = self._wall_color
-        used = self._used_color
-        unused = self._unused_color
+        wall = self._wall_brush
+        used = self._used_brush
+        unused = self._unused_brush
+
+        interior = dim.interior
+        column_coords = dim.column_coords
+        # Each run of same-colored cells in a row is drawn as one rectangle
+        # straight through the walls; the walls are then drawn back on top.
+        # Runs are binned by their cell value so there's no per-cell test.
+        unused_rects, used_rects = by_value = [], []
+        for r, y in enumerate(dim.row_coords):
+            for is_on, start, stop in mask.row_runs(r):
+                x = column_coords[start]
+                by_value[is_on].append(QRectF(
+                    x, y, column_coords[stop - 1] - x + interior, interior
+                ))
+        wall_rects = [
+            QRectF(x - dim.wall, 0, dim.wall, dim.height)
+                for x in column_coords[1:]
+        ]
 
-        p = QPainter(self)
-        p.setRenderHint(QPainter.Antialiasing)
+        p.fillRect(0, 0, dim.width, dim.height, wall)
+        fill_rects(p, (
+            (used, used_rects), (unused, unused_rects), (wall, wall_rects)
+        ))
+
+    def _toggle(self, r, c):
+        self._mask[r, c] = not self._mask[r, c]
+        self._has_changed = True
+        self._draw_cell(r, c)
+        self.update(self._cell_rect(r, c))
+
+    def _draw_cell(self, r, c):
+        # Touch up just the one cell in the cache (if there is one yet).
+        if self._scaled is None:
+            return
+
+        p = self._scaled_painter()
+        fill_rects(p, self._cell_fills(r, c))
+        p.end()
+
+    def _scaled_painter(self):
+        dim = self._dim
+        p = QPainter(self._scaled)
         p.scale(self.width() / dim.width, self.height() / dim.height)
+        return p
 
-        p.fillRect(0, 0, dim.width, dim.height, wall)
-        for r in range(mask.rows):
-            y = dim.row_coord(r)
-            for c in range(mask.columns):
-                x = dim.column_coord(c)
-                p.fillRect(
-                    x, y, *dim.interior_rect, used if mask[r, c] else unused
-                )
+    def _cell_fills(self, r, c):
+        dim = self._dim
+        brush = self._used_brush if self._mask[r, c] else self._unused_brush
+        return ((brush, [ QRectF(
+            dim.column_coords[c], dim.row_coords[r], dim.interior, dim.interior
+        ) ]),)
+
+    def _cell_rect(self, r, c):
+        # The widget area covered by a cell and the walls around it.
+        dim = self._dim
+        sx, sy = self.width() / dim.width, self.height() / dim.height
+        x, y = dim.column_coords[c] - dim.wall, dim.row_coords[r] - dim.wall
+        size = dim.interior + 2 * dim.wall
+        return QRectF(
+            x * sx, y * sy, size * sx, size * sy
+        ).toAlignedRect().adjusted(-1, -1, 1, 1)
 
     def _rowcol(self, pos):
         H = self.height() / self._mask.rows
@@ -155,9 +256,7 @@ class MaskWidget(QWidget):
 
         r, c = self._rowcol(event.pos())
         if self._lastpos is None:
-            self._mask[r, c] = not self._mask[r, c]
-            self._has_changed = True
-            self.update()
+            self._toggle(r, c)
 
         self._lastpos = (r, c)
 
@@ -177,10 +276,7 @@ class MaskWidget(QWidget):
         if lastpos == pos:
             return
 
-        r, c = pos
-        self._mask[r, c] = not self._mask[r, c]
-        self._has_changed = True
-        self.update()
+        self._toggle(*pos)
         self._lastpos = pos
 
     def mouseReleaseEvent(self, event):
@@ -322,15 +418,9 @@ class MaskMainWindow(QMainWindow):
         if new_cols < 1:
             return
 
-        new_mask = Mask(new_rows, new_cols)
-        for r in range(min(mask.rows, new_mask.rows)):
-            for c in range(min(mask.columns, new_mask.columns)):
-                new_mask[r, c] = mask[r, c]
-
-        nmw = MaskWidget(new_mask)
-        nmw.has_changed = mw.has_changed
-        self.setCentralWidget(nmw)
-        self._size_label.setText(f'{new_mask.rows}x{new_mask.columns}')
+        mask.resize_preserve(new_rows, new_cols)
+        mw.refresh_after_resize()
+        self._size_label.setText(f'{mask.rows}x{mask.columns}')
 
     @Slot()
     def increment_width(self):
@@ -353,44 +443,88 @@ def cell_color(rgb):
         return Qt.white
 
     r, g, b = rgb
-    s = lambda x: round(255 * x)
 
-    return QColor(s(r), s(g), s(b))
+    return QColor(int(255 * r + 0.5), int(255 * g + 0.5), int(255 * b + 0.5))
 
 class MazeWidget(MaskWidget):
     def __init__(self, grid, parent=None):
-        super().__init__(Mask(grid.rows, grid.columns), parent)
+        # Every cell starts on so the mask isn't made until it's needed.
+        super().__init__(None, parent)
 
+        # Mazes don't change once generated so their links can be cached.
         self._grid = grid
+        self._dim = DrawingDimensions(grid)
+        self._link_E, self._link_S = grid.link_matrices
 
-    def paintEvent(self, event):
-        grid = self._grid
+    def mousePressEvent(self, event):
+        if self._mask is None and Qt.LeftButton == event.button():
+            self._mask = Mask(self._grid.rows, self._grid.columns)
+
+        super().mousePressEvent(event)
+
+    def _cell_fills(self, r, c):
+        # A cell's color also covers its passages and the passages into it
+        # from the W and N are colored by the cells they come from.
+        mask = self._mask
+        dim = self._dim
+        wall, interior = dim.wall, dim.interior
+        x, y = dim.column_coords[c], dim.row_coords[r]
+        brush_at = lambda r, c: (
+            self._used_brush if mask[r, c] else self._unused_brush
+        )
+
+        rects = [ QRectF(x, y, interior, interior) ]
+        if self._link_E[r][c]:
+            rects.append(QRectF(x + interior, y, wall, interior))
+        if self._link_S[r][c]:
+            rects.append(QRectF(x, y + interior, interior, wall))
+        fills = [(brush_at(r, c), rects)]
+        if c > 0 and self._link_E[r][c - 1]:
+            fills.append(
+                (brush_at(r, c - 1), [ QRectF(x - wall, y, wall, interior) ])
+            )
+        if r > 0 and self._link_S[r - 1][c]:
+            fills.append(
+                (brush_at(r - 1, c), [ QRectF(x, y - wall, interior, wall) ])
+            )
+
+        return fills
+
+    def _draw(self, p):
         mask = self._mask
         dim = self._dim
-        wall = self._wall_color
-        used = self._used_color
-        unused = self._unused_color
-        dummy_cell = Cell(-1, -1)
-        interior_rect = dim.interior_rect
-        E_neighbor_rect = dim.east_neighbor_rect
-        S_neighbor_rect = dim.south_neighbor_rect
-
-        p = QPainter(self)
+        iw, ih = dim.interior_rect
+        ew, eh = dim.east_neighbor_rect
+        sw, sh = dim.south_neighbor_rect
+        column_coords = dim.column_coords
+        # Without a mask every cell is on, i.e., the whole row is one run.
+        all_on = ((1, 0, len(column_coords)),)
+
 #        p.setRenderHint(QPainter.Antialiasing)
-        p.scale(self.width() / dim.width, self.height() / dim.height)
 
-        p.fillRect(0, 0, dim.width, dim.height, wall)
-        for r, row in enumerate(grid.each_row):
-            y = dim.row_coord(r)
-            for c, cell in enumerate(row):
-                x = dim.column_coord(c)
-                cell = cell or dummy_cell
-                color = used if mask[r, c] else unused
-                p.fillRect(x, y, *interior_rect, color)
-                if cell.linked_to(cell.E):
-                    p.fillRect(x, y, *E_neighbor_rect, color)
-                if cell.linked_to(cell.S):
-                    p.fillRect(x, y, *S_neighbor_rect, color)
+        # As with masks, runs are binned by their cell value.
+        unused_rects, used_rects = by_value = [], []
+        for r, y in enumerate(dim.row_coords):
+            E_row, S_row = self._link_E[r], self._link_S[r]
+            runs = all_on if mask is None else mask.row_runs(r)
+            for is_on, start, stop in runs:
+                rects = by_value[is_on]
+                # Cells linked E within the run form one rectangle.
+                for c in range(start, stop):
+                    x = column_coords[c]
+                    if S_row[c]:
+                        rects.append(QRectF(x, y, sw, sh))
+                    if E_row[c] and c + 1 < stop:
+                        continue
+                    x0 = column_coords[start]
+                    w = x - x0 + (ew if E_row[c] else iw)
+                    rects.append(QRectF(x0, y, w, ih))
+                    start = c + 1
+
+        p.fillRect(0, 0, dim.width, dim.height, self._wall_brush)
+        fill_rects(p, (
+            (self._used_brush, used_rects), (self._unused_brush, unused_rects)
+        ))
 
 class MazeMainWindow(QMainWindow):
     def __init__(self, parent=None):
@@ -412,8 +546,10 @@ class MazeMainWindow(QMainWindow):
         if QDialog.Rejected == rc.exec_():
             return
 
+        from . import algorithm
+
         self.setCentralWidget(MazeWidget(
-            getattr(algorithm, rc.algorithm)(ColoredGrid(rc.rows, rc.columns))
+            algorithm.by_name[rc.algorithm](ColoredGrid(rc.rows, rc.columns))
         ))
 
 def mask_edit_main():